@@ -0,0 +1,220 @@
+"""
+FastAPI application for Roadside Assistance Agent (served by main.py)
+"""
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import Depends, FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
+from typing import Dict, Optional, List
+from redis import asyncio as aioredis
+import orjson
+import fcntl
+import os
+import tempfile
+
+from config import (
+    CORS_ORIGINS, STATIC_DIR, CASES_FILE, CASES_LOCK_FILE,
+    REDIS_URL, SESSION_TTL_SECONDS, MAX_HISTORY_TURNS
+)
+from services.agent import RoadsideAgent
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the agent and open the Redis connection pool used for session
+    storage. Done here rather than at import so only the app uvicorn
+    actually serves pays for Gemini setup and garage loading.
+    """
+    app.state.agent = RoadsideAgent()
+    app.state.redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+    try:
+        yield
+    finally:
+        await app.state.redis.aclose()
+
+app = FastAPI(
+    title="Roadside Assistance API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# --- CORS MIDDLEWARE ---
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# --- SERVE STATIC FILES ---
+app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+
+# --- DATA MODELS ---
+class UserInput(BaseModel):
+    session_id: str
+    text: str
+
+class AgentResponse(BaseModel):
+    voice_response: str
+    ui_update: Optional[Dict] = None
+    collected_data: Optional[Dict] = None
+    is_covered: Optional[bool] = None
+    dispatch_details: Optional[Dict] = None
+    conversation_complete: Optional[bool] = False
+
+# --- DEPENDENCIES ---
+def get_agent(request: Request) -> RoadsideAgent:
+    """Dependency returning this worker's agent"""
+    return request.app.state.agent
+
+# --- STATE MANAGEMENT (Redis) ---
+def get_redis(request: Request) -> aioredis.Redis:
+    """Dependency returning the shared Redis client"""
+    return request.app.state.redis
+
+def _session_key(session_id: str) -> str:
+    return f"roadside:session:{session_id}:history"
+
+async def get_history(store: aioredis.Redis, session_id: str) -> List[Dict]:
+    """Get conversation history for a session (empty for a new session)"""
+    entries = await store.lrange(_session_key(session_id), 0, -1)
+    return [orjson.loads(entry) for entry in entries]
+
+async def append_history(store: aioredis.Redis, session_id: str, *entries: Dict):
+    """
+    Append entries to a session's history and refresh the session expiry.
+    History is a Redis list of individually serialized entries, so only the
+    new turn is encoded; older turns are never re-serialized.
+    """
+    key = _session_key(session_id)
+    async with store.pipeline(transaction=True) as pipe:
+        pipe.rpush(key, *(orjson.dumps(entry) for entry in entries))
+        # Keep a sliding window of recent turns. Every model reply carries the
+        # cumulative collected_data, so older turns can be dropped safely.
+        pipe.ltrim(key, -MAX_HISTORY_TURNS * 2, -1)
+        pipe.expire(key, SESSION_TTL_SECONDS)
+        await pipe.execute()
+
+# --- CASE HISTORY HELPERS ---
+# cases.json is shared by every worker process: writes replace the file
+# atomically, and read-append-write sequences hold an exclusive file lock.
+@contextmanager
+def _cases_lock():
+    with open(CASES_LOCK_FILE, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _read_cases():
+    try:
+        with open(CASES_FILE, "rb") as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return []
+
+def _write_cases(cases):
+    fd, tmp_path = tempfile.mkstemp(dir=CASES_FILE.parent, prefix=CASES_FILE.name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(cases, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, CASES_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# --- API ENDPOINTS ---
+@app.get("/")
+async def root():
+    """Redirect to the frontend"""
+    return {"message": "Roadside Assistance API", "frontend": "/static/index.html"}
+
+async def _record_turn(store: aioredis.Redis, session_id: str, user_text: str, ai_response: Dict):
+    """Store a user/model exchange in the session history"""
+    await append_history(
+        store, session_id,
+        {"role": "user", "parts": [user_text]},
+        {"role": "model", "parts": [orjson.dumps(ai_response).decode()]},
+    )
+
+def _response_payload(ai_response: Dict) -> Dict:
+    """Shape an agent result as an AgentResponse payload"""
+    return {
+        "voice_response": ai_response.get("voice_response", "I am sorry, I didn't catch that."),
+        "ui_update": ai_response.get("ui_update"),
+        "collected_data": ai_response.get("collected_data"),
+        "is_covered": ai_response.get("is_covered"),
+        "dispatch_details": ai_response.get("dispatch_details"),
+        "conversation_complete": ai_response.get("conversation_complete", False)
+    }
+
+def _sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+@app.post("/agent/chat", response_model=AgentResponse)
+async def chat(input_data: UserInput, store: aioredis.Redis = Depends(get_redis),
+               agent: RoadsideAgent = Depends(get_agent)):
+    """Main chat endpoint for AI agent interaction"""
+    history = await get_history(store, input_data.session_id)
+    user_text = input_data.text
+
+    # Get response from AI Agent
+    ai_response = await agent.process_request(history, user_text)
+
+    # Update conversation history
+    await _record_turn(store, input_data.session_id, user_text, ai_response)
+
+    # Return structured response. Gemini's response schema already fixes the
+    # shape, so skip Pydantic validation; response_model still documents it.
+    return ORJSONResponse(_response_payload(ai_response))
+
+@app.post("/agent/chat/stream")
+async def chat_stream(input_data: UserInput, store: aioredis.Redis = Depends(get_redis),
+                      agent: RoadsideAgent = Depends(get_agent)):
+    """
+    Streaming chat endpoint (Server-Sent Events). Sends a "voice_response"
+    event once Gemini has finished the reply text, then a "response" event
+    with the full AgentResponse payload once dispatch has been resolved.
+    The "response" event's voice_response always overrides the streamed one.
+    """
+    history = await get_history(store, input_data.session_id)
+    user_text = input_data.text
+
+    async def events():
+        async for event, payload in agent.stream_request(history, user_text):
+            if event == "response":
+                await _record_turn(store, input_data.session_id, user_text, payload)
+                payload = _response_payload(payload)
+            yield _sse_event(event, payload)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/healthz")
+async def healthz(agent: RoadsideAgent = Depends(get_agent)):
+    """Liveness check with Gemini concurrency usage for this worker"""
+    return {"status": "ok", "gemini": agent.concurrency_stats()}
+
+# --- CASE HISTORY ENDPOINTS ---
+# Plain def endpoints run in the threadpool, so waiting on the file lock
+# never blocks the event loop.
+@app.get("/cases")
+async def get_cases():
+    return _read_cases()
+
+@app.post("/cases")
+def save_case(case: dict):
+    with _cases_lock():
+        cases = _read_cases()
+        cases.append(case)
+        _write_cases(cases)
+    return {"saved": True}
+
+@app.delete("/cases")
+def clear_cases():
+    with _cases_lock():
+        _write_cases([])
+    return {"cleared": True}
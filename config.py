@@ -2,6 +2,7 @@
 Configuration settings for the Roadside Assistance Agent
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Base directory
@@ -12,8 +13,14 @@ DATA_DIR = BASE_DIR / "data"
 POLICY_COVERAGE_FILE = DATA_DIR / "policy_coverage.json"
 GARAGES_FILE = DATA_DIR / "garages.json"
 CASES_FILE = DATA_DIR / "cases.json"
+CASES_LOCK_FILE = DATA_DIR / "cases.json.lock"  # Serializes case writes across workers
 CUSTOMERS_FILE = DATA_DIR / "customers.json"
 
+# Parsed garage data is cached here so workers skip the JSON parse (shared memory on Linux)
+GARAGES_CACHE_DIR = Path(os.environ.get(
+    "GARAGES_CACHE_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+))
+
 # Prompt paths
 PROMPTS_DIR = BASE_DIR / "prompts"
 SYSTEM_INSTRUCTION_FILE = PROMPTS_DIR / "system_instruction.txt"
@@ -26,10 +33,18 @@ INDEX_HTML = STATIC_DIR / "index.html"
 API_HOST = "127.0.0.1"
 API_PORT = 8000
 BACKEND_URL = f"http://{API_HOST}:{API_PORT}"
+# Number of uvicorn worker processes (sessions are shared through Redis)
+API_WORKERS = int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 2) * 2 + 1))
+
+# Session Storage
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+SESSION_TTL_SECONDS = 60 * 60  # Idle sessions expire after 1 hour
+MAX_HISTORY_TURNS = 20  # User/model exchanges kept and re-sent to Gemini
 
 # Model Configuration
 MODEL_NAME = "gemini-2.5-flash"
 API_KEY = os.environ.get("GOOGLE_API_KEY")
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", 16))  # Per worker process
 
 # Server Configuration
 CORS_ORIGINS = ["*"]  # In production, specify exact origins
@@ -1,24 +1,67 @@
 """
 Roadside Assistance Agent using Google Gemini AI with Structured Outputs
 """
-import json
+import anyio
+import orjson
+from functools import lru_cache
 import google.generativeai as genai
+import ijson
 from dotenv import load_dotenv
-from pathlib import Path
-import sys
 from typing import Optional
 
-# Add parent directory to path for imports
-sys.path.append(str(Path(__file__).parent.parent))
-
 from config import (
     API_KEY, MODEL_NAME, POLICY_COVERAGE_FILE,
-    SYSTEM_INSTRUCTION_FILE, CUSTOMERS_FILE
+    SYSTEM_INSTRUCTION_FILE, CUSTOMERS_FILE, GEMINI_MAX_CONCURRENCY
 )
 from services.dispatch_service import DispatchService
 
 load_dotenv()
 
+PARSE_ERROR_MESSAGE = "I apologize, I had trouble processing that. Could you please repeat?"
+SERVICE_ERROR_MESSAGE = "I am having trouble connecting to the AI service. Please check the server logs."
+
+
+def _fallback_response(voice_response: str) -> dict:
+    """Response used when Gemini's reply cannot be obtained or parsed"""
+    return {
+        "voice_response": voice_response,
+        "ui_update": None,
+        "collected_data": {"name": "", "car": "", "location": "", "issue": "", "policy_level": ""},
+        "is_covered": False
+    }
+
+
+@lru_cache(maxsize=1)
+def _build_system_instruction() -> str:
+    """Render the system instruction with the policy and customer data injected"""
+    # The data files are already formatted JSON, so inject their text as is
+    try:
+        policy_text = POLICY_COVERAGE_FILE.read_text()
+    except FileNotFoundError:
+        print(f"⚠️ WARNING: {POLICY_COVERAGE_FILE} not found. Coverage check will fail.")
+        policy_text = "{}"
+
+    try:
+        customer_text = CUSTOMERS_FILE.read_text()
+    except FileNotFoundError:
+        print(f"⚠️ WARNING: {CUSTOMERS_FILE} not found. All customers will default to basic policy.")
+        customer_text = "[]"
+
+    # Load system instruction template
+    try:
+        with open(SYSTEM_INSTRUCTION_FILE, 'r') as f:
+            system_instruction_template = f.read()
+    except FileNotFoundError:
+        print(f"⚠️ WARNING: {SYSTEM_INSTRUCTION_FILE} not found. Using default prompt.")
+        system_instruction_template = "You are a helpful assistant. {policy_text} {customer_text}"
+
+    # Inject policy and customer database into system instruction
+    return system_instruction_template.format(
+        policy_text=policy_text,
+        customer_text=customer_text
+    )
+
+
 class RoadsideAgent:
     def __init__(self):
         # Configure API
@@ -30,37 +73,11 @@ class RoadsideAgent:
         # Initialize dispatch service
         self.dispatch_service = DispatchService()
 
-        # Load policy document
-        try:
-            with open(POLICY_COVERAGE_FILE, 'r') as f:
-                policy_doc = json.load(f)
-            policy_text = json.dumps(policy_doc, indent=2)
-        except FileNotFoundError:
-            print(f"⚠️ WARNING: {POLICY_COVERAGE_FILE} not found. Coverage check will fail.")
-            policy_text = "{}"
-
-        # Load customer database
-        try:
-            with open(CUSTOMERS_FILE, 'r') as f:
-                customer_list = json.load(f)
-            customer_text = json.dumps(customer_list, indent=2)
-        except FileNotFoundError:
-            print(f"⚠️ WARNING: {CUSTOMERS_FILE} not found. All customers will default to basic policy.")
-            customer_text = "[]"
-
-        # Load system instruction template
-        try:
-            with open(SYSTEM_INSTRUCTION_FILE, 'r') as f:
-                system_instruction_template = f.read()
-        except FileNotFoundError:
-            print(f"⚠️ WARNING: {SYSTEM_INSTRUCTION_FILE} not found. Using default prompt.")
-            system_instruction_template = "You are a helpful assistant. {policy_text} {customer_text}"
-
-        # Inject policy and customer database into system instruction
-        system_instruction = system_instruction_template.format(
-            policy_text=policy_text,
-            customer_text=customer_text
-        )
+        # Bound in-flight Gemini calls; excess requests wait here instead of
+        # hitting the upstream rate limit
+        self._gemini_slots = anyio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+        system_instruction = _build_system_instruction()
 
         # Define the response schema for structured output
         response_schema = {
@@ -118,7 +135,7 @@ class RoadsideAgent:
             }
         )
 
-    def process_request(self, history, user_text):
+    async def process_request(self, history, user_text):
         """
         Sends the user text to Gemini with the conversation history.
         Returns the parsed JSON response with dispatch information if covered.
@@ -128,70 +145,119 @@ class RoadsideAgent:
             # Start a chat session with the provided history
             chat = self.model.start_chat(history=history)
 
-            # Send the message - Gemini will return valid JSON matching our schema
-            response = chat.send_message(user_text)
+            # Send the message without blocking the event loop - Gemini will
+            # return valid JSON matching our schema
+            async with self._gemini_slots:
+                response = await chat.send_message_async(user_text)
 
             # Parse the JSON response (guaranteed to be valid JSON)
-            result = json.loads(response.text)
-
-            # If covered, add dispatch information
-            if result.get("is_covered") and result.get("collected_data"):
-                collected = result["collected_data"]
-                location = collected.get("location", "")
-                issue = collected.get("issue", "")
-                name = collected.get("name", "Customer")
-
-                # Check if we have actual data (not empty strings)
-                if location and issue and location.strip() and issue.strip():
-                    # Find best garage and create dispatch decision
-                    dispatch_decision = self.dispatch_service.find_best_garage(location, issue)
-
-                    if dispatch_decision:
-                        # Generate detailed dispatch message
-                        dispatch_summary = self.dispatch_service.generate_dispatch_summary(
-                            dispatch_decision, name
-                        )
-
-                        # Update UI with dispatch details
-                        result["ui_update"] = {
-                            "type": "SMS_NOTIFICATION",
-                            "content": f"Help is on the way!\n\n{dispatch_summary}",
-                            "status": "DISPATCHED"
-                        }
+            result = orjson.loads(response.text)
+            return self._add_dispatch(result)
 
-                        # Add dispatch details to result
-                        result["dispatch_details"] = dispatch_decision.to_dict()
+        except orjson.JSONDecodeError as e:
+            print(f"❌ JSON DECODE ERROR: {e}")
+            print(f"    Raw response: {response.text if 'response' in locals() else 'N/A'}")
+            return _fallback_response(PARSE_ERROR_MESSAGE)
+        except Exception as e:
+            print(f"❌ AGENT ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+            return _fallback_response(SERVICE_ERROR_MESSAGE)
 
-                        # Enhance voice response with dispatch info
-                        service_type = "tow truck" if dispatch_decision.service_type == "tow_truck" else "repair truck"
-                        result["voice_response"] += f" A {service_type} from {dispatch_decision.garage_name} will arrive in approximately {dispatch_decision.estimated_arrival}."
-                else:
-                    # Not all data collected yet
-                    result["ui_update"] = None
-                    result["dispatch_details"] = None
-            else:
-                # Not covered or data incomplete
-                result["ui_update"] = None
-                result["dispatch_details"] = None
+    async def stream_request(self, history, user_text):
+        """
+        Streaming variant of process_request. Yields (event, payload) pairs:
+        a "voice_response" event once Gemini has finished that field, then
+        one "response" event with the full result, dispatch included.
+        The "response" event's voice_response always overrides the streamed
+        one: it may add dispatch info, or replace it with a fallback message
+        if the rest of the reply fails to parse.
+        Gemini orders response_schema properties alphabetically and the SDK
+        cannot override that, so voice_response is usually generated last;
+        currently this gives no time-to-first-audio gain over process_request.
+        """
+        raw_text = ""
+        try:
+            chat = self.model.start_chat(history=history)
 
-            return result
+            # The slot is held until the whole stream has been received
+            async with self._gemini_slots:
+                response = await chat.send_message_async(user_text, stream=True)
 
-        except json.JSONDecodeError as e:
+                # Parse top-level fields incrementally as the JSON text arrives
+                fields = ijson.sendable_list()
+                parser = ijson.kvitems_coro(fields, "")
+                async for chunk in response:
+                    raw_text += chunk.text
+                    parser.send(chunk.text.encode())
+                    for key, value in fields:
+                        if key == "voice_response":
+                            yield "voice_response", {"voice_response": value}
+                    del fields[:]
+                parser.close()
+
+            result = orjson.loads(raw_text)
+        except (orjson.JSONDecodeError, ijson.JSONError) as e:
             print(f"❌ JSON DECODE ERROR: {e}")
-            print(f"    Raw response: {response.text if 'response' in locals() else 'N/A'}")
-            return {
-                "voice_response": "I apologize, I had trouble processing that. Could you please repeat?",
-                "ui_update": None,
-                "collected_data": {"name": "", "car": "", "location": "", "issue": "", "policy_level": ""},
-                "is_covered": False
-            }
+            print(f"    Raw response: {raw_text or 'N/A'}")
+            yield "response", _fallback_response(PARSE_ERROR_MESSAGE)
+            return
         except Exception as e:
             print(f"❌ AGENT ERROR: {e}")
             import traceback
             traceback.print_exc()
-            return {
-                "voice_response": "I am having trouble connecting to the AI service. Please check the server logs.",
-                "ui_update": None,
-                "collected_data": {"name": "", "car": "", "location": "", "issue": "", "policy_level": ""},
-                "is_covered": False
-            }
+            yield "response", _fallback_response(SERVICE_ERROR_MESSAGE)
+            return
+
+        yield "response", self._add_dispatch(result)
+
+    def concurrency_stats(self) -> dict:
+        """Current usage of the Gemini concurrency limit"""
+        return {
+            "limit": GEMINI_MAX_CONCURRENCY,
+            "available": self._gemini_slots.value,
+            "waiting": self._gemini_slots.statistics().tasks_waiting
+        }
+
+    def _add_dispatch(self, result):
+        """Add dispatch information to a parsed Gemini response if covered"""
+        if result.get("is_covered") and result.get("collected_data"):
+            collected = result["collected_data"]
+            location = collected.get("location", "")
+            issue = collected.get("issue", "")
+            name = collected.get("name", "Customer")
+
+            # Check if we have actual data (not empty strings)
+            if location and issue and location.strip() and issue.strip():
+                # Find best garage and create dispatch decision
+                dispatch_decision = self.dispatch_service.find_best_garage(location, issue)
+
+                if dispatch_decision:
+                    # Generate detailed dispatch message
+                    dispatch_summary = self.dispatch_service.generate_dispatch_summary(
+                        dispatch_decision, name
+                    )
+
+                    # Update UI with dispatch details
+                    result["ui_update"] = {
+                        "type": "SMS_NOTIFICATION",
+                        "content": f"Help is on the way!\n\n{dispatch_summary}",
+                        "status": "DISPATCHED"
+                    }
+
+                    # Add dispatch details to result
+                    result["dispatch_details"] = dispatch_decision.to_dict()
+
+                    # Enhance voice response with dispatch info
+                    service_type = "tow truck" if dispatch_decision.service_type == "tow_truck" else "repair truck"
+                    result["voice_response"] += f" A {service_type} from {dispatch_decision.garage_name} will arrive in approximately {dispatch_decision.estimated_arrival}."
+            else:
+                # Not all data collected yet
+                result["ui_update"] = None
+                result["dispatch_details"] = None
+        else:
+            # Not covered or data incomplete
+            result["ui_update"] = None
+            result["dispatch_details"] = None
+
+        return result
@@ -1,26 +1,138 @@
 """
 Dispatch Service for finding closest garages and determining next best action
 """
-import json
+import hashlib
 import math
-import sys
+import mmap
+import os
+import pickle
+import re
+import tempfile
+from collections import defaultdict
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+import numpy as np
+import orjson
+from numba import njit
+
+from config import GARAGES_FILE, GARAGES_CACHE_DIR
+
+EARTH_RADIUS_KM = 6371
+LOOKUP_CACHE_SIZE = 1024
+
+# Mock geocoding table: location keywords -> coordinates, in priority order
+LOCATION_KEYWORDS = [
+    (("san francisco", "sf", "highway 101"), (37.7749, -122.4194)),
+    (("oakland",), (37.8044, -122.2712)),
+    (("palo alto", "stanford"), (37.4419, -122.1430)),
+    (("san jose",), (37.3382, -121.8863)),
+]
+DEFAULT_LOCATION = (37.7849, -122.4094)  # SF downtown
+
+# Issue keywords -> dispatch rule category, in priority order
+ISSUE_KEYWORDS = [
+    (("flat", "tire", "puncture"), "flat_tire"),
+    (("battery", "won't start", "dead"), "battery_dead"),
+    (("engine", "overheating", "smoke"), "engine_failure"),
+    (("transmission", "gear"), "transmission_issue"),
+    (("accident", "collision", "crash"), "accident_damage"),
+]
+DEFAULT_ISSUE_CATEGORY = "engine_failure"  # Default to towing for unknown issues
+
+
+class _KeywordMatcher:
+    """Single compiled regex over every keyword of a priority-ordered table"""
+
+    def __init__(self, table):
+        self._lookup = {}
+        for rank, (keywords, value) in enumerate(table):
+            for keyword in keywords:
+                self._lookup.setdefault(keyword, (rank, value))
+
+        # A zero-width lookahead tries every position, so overlapping keywords
+        # (e.g. "accidentire") are all seen; highest-priority alternatives first
+        # so each position reports its best keyword
+        alternatives = sorted(self._lookup, key=lambda k: self._lookup[k][0])
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(k) for k in alternatives) + "))")
+
+    def match(self, text: str, default):
+        """Return the value of the highest-priority keyword found in text"""
+        best_rank, best_value = len(self._lookup), default
+        for m in self._pattern.finditer(text.lower()):
+            rank, value = self._lookup[m.group(1)]
+            if rank < best_rank:
+                best_rank, best_value = rank, value
+                if rank == 0:
+                    break
+        return best_value
+
+
+_location_matcher = _KeywordMatcher(LOCATION_KEYWORDS)
+_issue_matcher = _KeywordMatcher(ISSUE_KEYWORDS)
+
+
+@njit(cache=True, fastmath=True)
+def _haversine_argmin(lat, lon, lats, lons, idxs):
+    """
+    Find the closest of the garages at idxs using Haversine formula.
+    All coordinates are in radians. Returns (garage index, distance in km);
+    ties go to the first garage in idxs.
+    """
+    cos_lat = math.cos(lat)
+    best_idx = -1
+    best_a = 0.0
+    for k in range(idxs.shape[0]):
+        i = idxs[k]
+        delta_lat = lats[i] - lat
+        delta_lon = lons[i] - lon
+        a = math.sin(delta_lat/2)**2 + cos_lat * math.cos(lats[i]) * math.sin(delta_lon/2)**2
+        # Distance grows monotonically with a, so compare a directly
+        if best_idx == -1 or a < best_a:
+            best_idx = i
+            best_a = a
+
+    return best_idx, EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(best_a))
 
-# Add parent directory to path for imports
-sys.path.append(str(Path(__file__).parent.parent))
-
-from config import GARAGES_FILE
 
 @dataclass
+class GarageTable:
+    """Garage network stored column-wise; row i of every field is garage i"""
+    lats: np.ndarray  # latitude in radians
+    lons: np.ndarray  # longitude in radians
+    names: Tuple[str, ...]
+    addresses: Tuple[str, ...]
+    estimated_arrivals: Tuple[str, ...]
+    by_service: Dict[str, np.ndarray]  # service -> indices of garages offering it
+
+    @classmethod
+    def from_records(cls, garages: List[dict]) -> "GarageTable":
+        """Build the table from the garage records in garages.json"""
+        by_service: Dict[str, List[int]] = defaultdict(list)
+        for idx, garage in enumerate(garages):
+            for svc in garage['services']:
+                by_service[svc].append(idx)
+
+        return cls(
+            lats=np.radians(np.array([g['latitude'] for g in garages], dtype=np.float64)),
+            lons=np.radians(np.array([g['longitude'] for g in garages], dtype=np.float64)),
+            names=tuple(g['name'] for g in garages),
+            addresses=tuple(g['address'] for g in garages),
+            estimated_arrivals=tuple(g['estimated_arrival'] for g in garages),
+            by_service={svc: np.array(idxs, dtype=np.intp) for svc, idxs in by_service.items()},
+        )
+
+
+@dataclass(slots=True, frozen=True)
 class DispatchDecision:
-    """Result of dispatch decision"""
+    """Result of dispatch decision (immutable, so cached decisions can be shared)"""
     garage_name: str
     garage_address: str
     service_type: str  # "tow_truck" or "repair_truck"
     estimated_arrival: str
-    additional_services: List[str]  # ["taxi", "rental_car"]
+    additional_services: Tuple[str, ...]  # ("taxi", "rental_car")
     priority: str
 
     def to_dict(self) -> dict:
@@ -29,11 +141,107 @@ class DispatchDecision:
             "garage_address": self.garage_address,
             "service_type": self.service_type,
             "estimated_arrival": self.estimated_arrival,
-            "additional_services": self.additional_services,
+            "additional_services": list(self.additional_services),
             "priority": self.priority
         }
 
 
+# Bump when from_records or the dispatch rule normalisation changes what is
+# cached; GarageTable's field names are part of the cache key automatically
+GARAGE_CACHE_FORMAT_VERSION = 1
+
+
+def _garage_cache_version() -> str:
+    field_names = ",".join(f.name for f in fields(GarageTable))
+    return f"{GARAGE_CACHE_FORMAT_VERSION}:{field_names}"
+
+
+def _garage_cache_path(source: Path) -> Path:
+    """Per-user cache file for a garages JSON file and cache format"""
+    digest = hashlib.sha1(f"{source}|{_garage_cache_version()}".encode()).hexdigest()[:12]
+    user = os.getuid() if hasattr(os, "getuid") else "user"
+    return Path(GARAGES_CACHE_DIR) / f"roadside-garages-{user}-{digest}.pkl"
+
+
+def _read_garage_cache(cache_file: Path, source: Path, source_mtime: int):
+    """Return the cached (GarageTable, dispatch_rules) for source, or None if stale or unusable"""
+    try:
+        with open(cache_file, 'rb') as f:
+            # Only trust a cache file that this user wrote and nobody else can modify
+            st = os.fstat(f.fileno())
+            if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o022):
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                cached = pickle.loads(mm)
+
+        if (cached.get('version') != _garage_cache_version()
+                or cached.get('source') != str(source)
+                or cached.get('mtime_ns') != source_mtime):
+            return None
+        return GarageTable(**cached['columns']), cached['dispatch_rules']
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ WARNING: Ignoring unusable garage cache {cache_file}: {e}")
+        return None
+
+
+def _write_garage_cache(cache_file: Path, payload: dict):
+    """Atomically write the garage cache; failures only cost a re-parse later"""
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=cache_file.parent, prefix=cache_file.name)
+    except OSError as e:
+        print(f"⚠️ WARNING: Could not write garage cache {cache_file}: {e}")
+        return
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+    except Exception as e:
+        print(f"⚠️ WARNING: Could not write garage cache {cache_file}: {e}")
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def load_garage_data(garages_file: Path) -> Tuple[GarageTable, Dict[str, dict]]:
+    """
+    Load the garage table and dispatch rules, once per process.
+    The parsed data is also pickled to GARAGES_CACHE_DIR (shared memory where
+    available), so other workers and restarts load it without parsing the JSON.
+    """
+    source = Path(garages_file).resolve()
+    source_mtime = source.stat().st_mtime_ns
+    cache_file = _garage_cache_path(source)
+
+    cached = _read_garage_cache(cache_file, source, source_mtime)
+    if cached is not None:
+        return cached
+
+    with open(source, 'rb') as f:
+        data = orjson.loads(f.read())
+    garages = GarageTable.from_records(data['garages'])
+    # Build each rule's additional-services tuple once instead of per dispatch
+    dispatch_rules = {
+        category: {**rules, 'additional_services': tuple(rules.get('additional_services', ()))}
+        for category, rules in data['dispatch_rules'].items()
+    }
+
+    # Pickle plain columns rather than the dataclass so the cache loads the same
+    # whether this module was imported or run as a script
+    _write_garage_cache(cache_file, {
+        'version': _garage_cache_version(),
+        'source': str(source),
+        'mtime_ns': source_mtime,
+        'columns': {f.name: getattr(garages, f.name) for f in fields(garages)},
+        'dispatch_rules': dispatch_rules,
+    })
+    return garages, dispatch_rules
+
+
 class DispatchService:
     """Service for handling garage selection and dispatch decisions"""
 
@@ -41,62 +249,29 @@ class DispatchService:
         if garages_file is None:
             garages_file = GARAGES_FILE
 
-        with open(garages_file, 'r') as f:
-            data = json.load(f)
-            self.garages = data['garages']
-            self.dispatch_rules = data['dispatch_rules']
-
-    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate distance between two coordinates using Haversine formula (in km)"""
-        R = 6371  # Earth's radius in kilometers
+        # Shared, read-only data: parsed once per process (or loaded from cache)
+        self.garages, self.dispatch_rules = load_garage_data(Path(garages_file))
 
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
+        # Compile the distance kernel now, at worker startup, instead of on the
+        # first dispatch inside a request (a no-op once compiled)
+        _haversine_argmin(0.0, 0.0, np.zeros(1), np.zeros(1), np.zeros(1, dtype=np.intp))
 
-        a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-
-        return R * c
+        # Memoize lookups per instance: results depend only on the input strings
+        # and the garage data loaded above.
+        self._geocode_location = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._geocode_location)
+        self._categorize_issue = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._categorize_issue)
+        self.find_best_garage = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self.find_best_garage)
 
     def _geocode_location(self, location: str) -> Tuple[float, float]:
         """
         Mock geocoding - in production, use Google Maps Geocoding API
         For demo, return coordinates based on keywords in location
         """
-        location_lower = location.lower()
-
-        # Simple keyword matching for demo
-        if "san francisco" in location_lower or "sf" in location_lower or "highway 101" in location_lower:
-            return (37.7749, -122.4194)
-        elif "oakland" in location_lower:
-            return (37.8044, -122.2712)
-        elif "palo alto" in location_lower or "stanford" in location_lower:
-            return (37.4419, -122.1430)
-        elif "san jose" in location_lower:
-            return (37.3382, -121.8863)
-        else:
-            # Default to SF downtown
-            return (37.7849, -122.4094)
+        return _location_matcher.match(location, DEFAULT_LOCATION)
 
     def _categorize_issue(self, issue: str) -> str:
         """Categorize the issue to match dispatch rules"""
-        issue_lower = issue.lower()
-
-        if "flat" in issue_lower or "tire" in issue_lower or "puncture" in issue_lower:
-            return "flat_tire"
-        elif "battery" in issue_lower or "won't start" in issue_lower or "dead" in issue_lower:
-            return "battery_dead"
-        elif "engine" in issue_lower or "overheating" in issue_lower or "smoke" in issue_lower:
-            return "engine_failure"
-        elif "transmission" in issue_lower or "gear" in issue_lower:
-            return "transmission_issue"
-        elif "accident" in issue_lower or "collision" in issue_lower or "crash" in issue_lower:
-            return "accident_damage"
-        else:
-            # Default to towing for unknown issues
-            return "engine_failure"
+        return _issue_matcher.match(issue, DEFAULT_ISSUE_CATEGORY)
 
     def find_best_garage(self, location: str, issue: str) -> Optional[DispatchDecision]:
         """
@@ -123,37 +298,25 @@ class DispatchService:
         service_type = rules['service_type']
         required_service = rules['required_service']
         priority = rules['priority']
-        additional_services = rules.get('additional_services', [])
+        additional_services = rules['additional_services']
 
         # Find garages that can handle this service
-        suitable_garages = [
-            g for g in self.garages
-            if required_service in g['services']
-        ]
+        suitable = self.garages.by_service.get(required_service)
 
-        if not suitable_garages:
+        if suitable is None:
             return None
 
-        # Calculate distances and find closest
-        garage_distances = []
-        for garage in suitable_garages:
-            distance = self._calculate_distance(
-                customer_lat, customer_lon,
-                garage['latitude'], garage['longitude']
-            )
-            garage_distances.append((garage, distance))
-
-        # Sort by distance
-        garage_distances.sort(key=lambda x: x[1])
-
-        # Select best garage (closest with good rating)
-        best_garage = garage_distances[0][0]
+        # Select best garage (closest; ties go to the first listed)
+        best, _ = _haversine_argmin(
+            math.radians(customer_lat), math.radians(customer_lon),
+            self.garages.lats, self.garages.lons, suitable
+        )
 
         return DispatchDecision(
-            garage_name=best_garage['name'],
-            garage_address=best_garage['address'],
+            garage_name=self.garages.names[best],
+            garage_address=self.garages.addresses[best],
             service_type=service_type,
-            estimated_arrival=best_garage['estimated_arrival'],
+            estimated_arrival=self.garages.estimated_arrivals[best],
             additional_services=additional_services,
             priority=priority
         )
@@ -162,20 +325,22 @@ class DispatchService:
         """Generate a human-readable dispatch summary"""
         service_name = "tow truck" if decision.service_type == "tow_truck" else "repair truck"
 
-        summary = f"Dispatch Summary for {customer_name}:\n"
-        summary += f"• Service: {service_name.title()}\n"
-        summary += f"• Garage: {decision.garage_name}\n"
-        summary += f"• Location: {decision.garage_address}\n"
-        summary += f"• ETA: {decision.estimated_arrival}\n"
-        summary += f"• Priority: {decision.priority.upper()}\n"
+        lines = [
+            f"Dispatch Summary for {customer_name}:",
+            f"• Service: {service_name.title()}",
+            f"• Garage: {decision.garage_name}",
+            f"• Location: {decision.garage_address}",
+            f"• ETA: {decision.estimated_arrival}",
+            f"• Priority: {decision.priority.upper()}",
+        ]
 
         if decision.additional_services:
-            summary += f"• Additional Services: {', '.join(decision.additional_services).replace('_', ' ').title()}\n"
+            lines.append(f"• Additional Services: {', '.join(decision.additional_services).replace('_', ' ').title()}")
 
-        return summary
+        return "\n".join(lines) + "\n"
 
 
-# Example usage
+# Example usage (run from the project root: python -m services.dispatch_service)
 if __name__ == "__main__":
     service = DispatchService()
 
@@ -0,0 +1,130 @@
+"""
+Tests for RoadsideAgent.stream_request using a fake, chunked Gemini reply
+"""
+import asyncio
+import json
+
+import anyio
+import pytest
+
+import services.dispatch_service as dispatch
+from services.agent import (
+    RoadsideAgent, PARSE_ERROR_MESSAGE, SERVICE_ERROR_MESSAGE
+)
+from services.dispatch_service import DispatchService
+
+COVERED_REPLY = {
+    "voice_response": "You're covered, help is on the way.",
+    "is_covered": True,
+    "conversation_complete": False,
+    "collected_data": {
+        "name": "Ann", "car": "Civic", "location": "Oakland",
+        "issue": "flat tire", "policy_level": "basic"
+    }
+}
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStream:
+    """Async iterable of reply chunks that records how many were consumed"""
+
+    def __init__(self, text, size=7):
+        self.parts = [text[i:i + size] for i in range(0, len(text), size)]
+        self.consumed = 0
+
+    async def __aiter__(self):
+        for part in self.parts:
+            self.consumed += 1
+            yield FakeChunk(part)
+
+
+class FakeModel:
+    def __init__(self, reply_text=None, error=None):
+        self.reply_text = reply_text
+        self.error = error
+        self.stream = None
+
+    def start_chat(self, history):
+        return self
+
+    async def send_message_async(self, user_text, stream=False):
+        if self.error:
+            raise self.error
+        self.stream = FakeStream(self.reply_text)
+        return self.stream
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # Keep the garage cache written by DispatchService out of /dev/shm
+    monkeypatch.setattr(dispatch, "GARAGES_CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+def make_agent(model):
+    # Bypass __init__ so no Gemini client is configured
+    agent = RoadsideAgent.__new__(RoadsideAgent)
+    agent.model = model
+    agent.dispatch_service = DispatchService()
+    agent._gemini_slots = anyio.Semaphore(1)
+    return agent
+
+
+def collect(agent):
+    async def run():
+        events = []
+        async for event, payload in agent.stream_request([], "hello"):
+            events.append((event, payload, agent.model.stream and agent.model.stream.consumed))
+        return events
+    return asyncio.run(run())
+
+
+def test_voice_response_streamed_before_full_response():
+    model = FakeModel(json.dumps(COVERED_REPLY))
+    events = collect(make_agent(model))
+
+    assert [event for event, _, _ in events] == ["voice_response", "response"]
+
+    _, voice, consumed = events[0]
+    assert voice == {"voice_response": COVERED_REPLY["voice_response"]}
+    # voice_response is the first field here, so it is sent mid-stream
+    assert consumed < len(model.stream.parts)
+
+    _, response, _ = events[1]
+    assert response["voice_response"].startswith(COVERED_REPLY["voice_response"])
+    assert response["dispatch_details"]["garage_name"]
+    assert response["ui_update"]["status"] == "DISPATCHED"
+
+
+def test_voice_response_last_field_still_precedes_response():
+    # Gemini's default alphabetical property order puts voice_response last
+    reply = json.dumps(COVERED_REPLY, sort_keys=True)
+    events = collect(make_agent(FakeModel(reply)))
+
+    assert [event for event, _, _ in events] == ["voice_response", "response"]
+
+
+def test_bad_json_falls_back_to_parse_error_response():
+    agent = make_agent(FakeModel('{"voice_response": "Hi", "is_covered": tru'))
+    events = collect(agent)
+
+    # The streamed text is already out; the final response overrides it
+    assert [event for event, _, _ in events] == ["voice_response", "response"]
+    assert events[0][1] == {"voice_response": "Hi"}
+    _, response, _ = events[-1]
+    assert response["voice_response"] == PARSE_ERROR_MESSAGE
+    assert response["is_covered"] is False
+    assert agent._gemini_slots.value == 1
+
+
+def test_service_error_falls_back_to_service_error_response():
+    agent = make_agent(FakeModel(error=RuntimeError("upstream down")))
+    events = collect(agent)
+
+    assert [event for event, _, _ in events] == ["response"]
+    assert events[0][1]["voice_response"] == SERVICE_ERROR_MESSAGE
+    assert agent._gemini_slots.value == 1
@@ -0,0 +1,48 @@
+"""
+Differential tests: the compiled keyword matchers must agree with the
+original if/elif substring chains, including overlapping keywords
+"""
+import random
+
+import pytest
+
+from services.dispatch_service import (
+    DEFAULT_ISSUE_CATEGORY, DEFAULT_LOCATION, ISSUE_KEYWORDS, LOCATION_KEYWORDS,
+    _issue_matcher, _location_matcher
+)
+
+
+def reference_match(table, default, text):
+    text = text.lower()
+    for keywords, value in table:
+        if any(keyword in text for keyword in keywords):
+            return value
+    return default
+
+
+def glued_fragments(table, rng, count):
+    """Random strings built from keyword fragments glued together"""
+    words = [k for keywords, _ in table for k in keywords]
+    pieces = words + [w[:i] for w in words for i in range(1, len(w))] + [w[i:] for w in words for i in range(1, len(w))]
+    pieces += [" ", "x", "ire", "S", "F"]
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 5))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("accidentire", "flat_tire"),
+    ("I have a flat tire", "flat_tire"),
+    ("crash then overheating", "engine_failure"),
+    ("something odd", DEFAULT_ISSUE_CATEGORY),
+])
+def test_issue_examples(text, expected):
+    assert _issue_matcher.match(text, DEFAULT_ISSUE_CATEGORY) == expected
+
+
+@pytest.mark.parametrize("table, default, matcher", [
+    (ISSUE_KEYWORDS, DEFAULT_ISSUE_CATEGORY, _issue_matcher),
+    (LOCATION_KEYWORDS, DEFAULT_LOCATION, _location_matcher),
+])
+def test_matches_reference_on_glued_fragments(table, default, matcher):
+    rng = random.Random(1234)
+    for text in glued_fragments(table, rng, 20000):
+        assert matcher.match(text, default) == reference_match(table, default, text), text
@@ -0,0 +1,68 @@
+"""
+Tests for the pickled garage data cache in services.dispatch_service
+"""
+import pickle
+from pathlib import Path
+
+import pytest
+
+import services.dispatch_service as dispatch
+from config import GARAGES_FILE
+
+load_uncached = dispatch.load_garage_data.__wrapped__
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dispatch, "GARAGES_CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+def _cache_file():
+    return dispatch._garage_cache_path(Path(GARAGES_FILE).resolve())
+
+
+def _rewrite_cache(**changes):
+    cache_file = _cache_file()
+    payload = pickle.loads(cache_file.read_bytes())
+    payload.update(changes)
+    cache_file.write_bytes(pickle.dumps(payload))
+
+
+def test_cache_round_trip(cache_dir):
+    garages, rules = load_uncached(GARAGES_FILE)
+    assert _cache_file().exists()
+
+    cached_garages, cached_rules = load_uncached(GARAGES_FILE)
+    assert cached_garages.names == garages.names
+    assert (cached_garages.lats == garages.lats).all()
+    assert cached_rules == rules
+
+
+def test_version_change_is_a_cache_miss(cache_dir, monkeypatch):
+    load_uncached(GARAGES_FILE)
+    old_cache = _cache_file()
+
+    monkeypatch.setattr(dispatch, "GARAGE_CACHE_FORMAT_VERSION", dispatch.GARAGE_CACHE_FORMAT_VERSION + 1)
+    assert _cache_file() != old_cache
+    assert dispatch._read_garage_cache(
+        old_cache, Path(GARAGES_FILE).resolve(), Path(GARAGES_FILE).stat().st_mtime_ns
+    ) is None
+
+
+def test_mismatched_columns_fall_back_to_json(cache_dir):
+    garages, _ = load_uncached(GARAGES_FILE)
+    _rewrite_cache(columns={"unknown_field": []})
+
+    reloaded, _ = load_uncached(GARAGES_FILE)
+    assert reloaded.names == garages.names
+
+
+def test_failed_write_leaves_no_temp_file(cache_dir, monkeypatch):
+    def fail(*args, **kwargs):
+        raise pickle.PicklingError("boom")
+    monkeypatch.setattr(dispatch.pickle, "dump", fail)
+
+    garages, _ = load_uncached(GARAGES_FILE)
+    assert garages.names
+    assert list(cache_dir.iterdir()) == []